@@ -1,14 +1,21 @@
 from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import logging
 import os
-import json
+import sys
+import time
+import orjson
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timezone
 
 from models.request_models import GenerateRequest
-from models.response_models import GenerateResponse, HealthResponse, ErrorResponse
+from models.response_models import (
+    GenerateResponse, HealthResponse, ErrorResponse,
+    GENERATE_RESPONSE_ADAPTER, HEALTH_RESPONSE_ADAPTER
+)
 from services.llm_service import OllamaService
 from services.logging_service import InteractionLogger
 
@@ -28,7 +35,8 @@ app = FastAPI(
     description="A lightweight local REST API that simulates ModelVault's core feature: receiving a prompt and returning a generated response using Ollama.",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware for local development
@@ -43,6 +51,76 @@ app.add_middleware(
 # Initialize services
 ollama_service = OllamaService()
 interaction_logger = InteractionLogger()
+_warmup_task = None
+
+# Ollama probe results for /health are reused for HEALTH_CACHE_TTL seconds
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "2.0"))
+_health_cache = {"t": 0.0, "val": None}
+_health_lock = asyncio.Lock()
+
+# Constant Server-Sent Event framing, encoded once
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+SSE_DONE = b"data: [DONE]\n\n"
+
+# Streamed tokens are coalesced into writes of up to ~8KB, flushed at least every 25ms
+SSE_FLUSH_BYTES = 8192
+SSE_FLUSH_INTERVAL = 0.025
+
+async def coalesce_sse_frames(frames, max_bytes: int = SSE_FLUSH_BYTES, max_delay: float = SSE_FLUSH_INTERVAL):
+    """
+    Batch SSE frames into fewer, larger writes.
+    
+    Frames are buffered until the buffer reaches max_bytes or max_delay seconds
+    have passed since the last flush. The source is drained by a separate task,
+    so a stalled upstream never holds buffered tokens back past the flush
+    window, and whatever remains is flushed as soon as the source ends.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    end = object()
+    
+    async def pump():
+        try:
+            async for frame in frames:
+                await queue.put(frame)
+        finally:
+            queue.put_nowait(end)
+    
+    task = asyncio.create_task(pump())
+    buf = bytearray()
+    # Start outside the window so the first token is sent immediately
+    last_flush = loop.time() - max_delay
+    try:
+        while True:
+            if buf:
+                timeout = max(0.0, last_flush + max_delay - loop.time())
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield bytes(buf)
+                    buf.clear()
+                    last_flush = loop.time()
+                    continue
+            else:
+                frame = await queue.get()
+            
+            if frame is end:
+                break
+            
+            buf += frame
+            if len(buf) >= max_bytes or loop.time() - last_flush >= max_delay:
+                yield bytes(buf)
+                buf.clear()
+                last_flush = loop.time()
+        
+        if buf:
+            yield bytes(buf)
+        
+        # Surface any error raised by the source
+        await task
+    finally:
+        task.cancel()
 
 @app.on_event("startup")
 async def startup_event():
@@ -51,13 +129,28 @@ async def startup_event():
     logger.info(f"Ollama URL: {ollama_service.base_url}")
     logger.info(f"Default model: {ollama_service.default_model}")
     
+    global _warmup_task
+    
     # Check Ollama availability
     if ollama_service.is_available():
         models = ollama_service.get_available_models()
         logger.info(f"Ollama is available with models: {models}")
+        
+        # Load the default model in the background so the first request doesn't pay the
+        # cold start. It is warmed by name: Ollama resolves llama2 to llama2:latest itself
+        if models and os.getenv("OLLAMA_WARMUP", "true").lower() == "true":
+            _warmup_task = asyncio.create_task(run_in_threadpool(ollama_service.warm_up, ollama_service.default_model))
     else:
         logger.warning("Ollama service is not available - will use fallback responses")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued interaction logs and release connections and files."""
+    ollama_service.close()
+    await ollama_service.aclose()
+    # Waits for the writer thread to append any queued entries
+    await run_in_threadpool(interaction_logger.close)
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint with API information."""
@@ -68,20 +161,45 @@ async def root():
         "health": "/health"
     }
 
-@app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check():
-    """Health check endpoint."""
+def _check_ollama():
+    """Query Ollama availability and its installed models."""
+    # /health caches for HEALTH_CACHE_TTL, so bypass the service's longer-lived probe cache
+    ollama_service.invalidate_cache()
     ollama_available = ollama_service.is_available()
     available_models = ollama_service.get_available_models() if ollama_available else []
+    return ollama_available, available_models
+
+async def _probe_ollama():
+    """Return the cached Ollama probe result, refreshing it once the TTL expires."""
+    async with _health_lock:
+        if _health_cache["val"] is not None and time.monotonic() - _health_cache["t"] < HEALTH_CACHE_TTL:
+            return _health_cache["val"]
+        
+        _health_cache["val"] = await run_in_threadpool(_check_ollama)
+        _health_cache["t"] = time.monotonic()
+        return _health_cache["val"]
+
+@app.get("/health", tags=["Health"], responses={200: {"model": HealthResponse}})
+async def health_check():
+    """Health check endpoint."""
+    ollama_available, available_models = await _probe_ollama()
     
-    return HealthResponse(
+    health = HealthResponse(
         status="healthy",
         ollama_status="connected" if ollama_available else "disconnected",
-        timestamp=datetime.now(),
+        timestamp=datetime.now(timezone.utc),
         available_models=available_models
     )
+    return Response(
+        content=HEALTH_RESPONSE_ADAPTER.dump_json(health),
+        media_type="application/json"
+    )
 
-@app.post("/generate", tags=["Generation"])
+@app.post(
+    "/generate",
+    tags=["Generation"],
+    responses={200: {"model": GenerateResponse}, 500: {"model": ErrorResponse}}
+)
 async def generate_response(request: GenerateRequest):
     """
     Generate a response for the given prompt using Ollama.
@@ -93,17 +211,17 @@ async def generate_response(request: GenerateRequest):
     4. Logs the interaction to logs/log.jsonl
     """
     try:
-        logger.info(f"Generating {'streaming' if request.stream else 'complete'} response for prompt: {request.prompt[:100]}...")
+        logger.info("Generating %s response for prompt: %.100s...", "streaming" if request.stream else "complete", request.prompt)
         
         if request.stream:
             # Return streaming response
-            def generate_stream():
-                full_response = ""
+            async def generate_stream():
+                # Collect tokens in a list and join once, instead of repeated str concatenation
+                parts = []
                 model_name = ""
-                start_time = datetime.now()
                 
                 try:
-                    for chunk in ollama_service.generate_response_stream(
+                    async for chunk in ollama_service.agenerate_response_stream(
                         prompt=request.prompt,
                         model=request.model
                     ):
@@ -111,21 +229,19 @@ async def generate_response(request: GenerateRequest):
                         
                         # Send each token as Server-Sent Event
                         if chunk.get("token"):
-                            yield f"data: {json.dumps(chunk)}\n\n"
-                            full_response += chunk["token"]
+                            yield b"".join((SSE_PREFIX, orjson.dumps(chunk), SSE_SUFFIX))
+                            parts.append(chunk["token"])
                         
                         # Send final chunk when done
                         if chunk.get("done"):
-                            yield f"data: {json.dumps(chunk)}\n\n"
+                            yield b"".join((SSE_PREFIX, orjson.dumps(chunk), SSE_SUFFIX))
                             
-                            # Log the complete interaction
-                            end_time = datetime.now()
-                            duration_ms = int((end_time - start_time).total_seconds() * 1000)
+                            # Log the complete interaction, timed by the service's monotonic clock
                             log_data = {
-                                "response": full_response,
+                                "response": "".join(parts),
                                 "model": model_name,
-                                "timestamp": end_time,
-                                "duration_ms": duration_ms,
+                                "timestamp": datetime.now(timezone.utc),
+                                "duration_ms": chunk.get("duration_ms", 0),
                                 "success": chunk.get("success", True),
                                 "streaming": True
                             }
@@ -135,34 +251,36 @@ async def generate_response(request: GenerateRequest):
                             interaction_logger.log_interaction(request.prompt, log_data)
                             break
                     
-                    yield "data: [DONE]\n\n"
+                    yield SSE_DONE
                     
                 except Exception as e:
-                    logger.error(f"Error in streaming generation: {e}")
+                    logger.error("Error in streaming generation: %s", e)
                     error_chunk = {
                         "token": "",
                         "model": model_name or "error",
-                        "timestamp": datetime.now().isoformat(),
+                        "timestamp": datetime.now(timezone.utc),
                         "done": True,
                         "success": False,
                         "error": str(e)
                     }
-                    yield f"data: {json.dumps(error_chunk)}\n\n"
-                    yield "data: [DONE]\n\n"
+                    yield b"".join((SSE_PREFIX, orjson.dumps(error_chunk), SSE_SUFFIX))
+                    yield SSE_DONE
             
             return StreamingResponse(
-                generate_stream(),
-                media_type="text/plain",
+                coalesce_sse_frames(generate_stream()),
+                media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
                     "Connection": "keep-alive",
-                    "Content-Type": "text/plain; charset=utf-8"
+                    # Stop nginx and similar proxies from buffering the stream
+                    "X-Accel-Buffering": "no"
                 }
             )
         
         else:
-            # Generate complete response
-            response_data = ollama_service.generate_response(
+            # Generate complete response. Concurrent requests are not batched
+            # here: Ollama queues anything beyond OLLAMA_NUM_PARALLEL itself
+            response_data = await ollama_service.agenerate_response(
                 prompt=request.prompt,
                 model=request.model
             )
@@ -170,21 +288,25 @@ async def generate_response(request: GenerateRequest):
             # Log the interaction
             interaction_logger.log_interaction(request.prompt, response_data)
             
-            # Return the response
-            return GenerateResponse(
+            # Return the response, serialized directly by pydantic-core
+            result = GenerateResponse(
                 response=response_data["response"],
                 model=response_data["model"],
                 timestamp=response_data["timestamp"]
             )
+            return Response(
+                content=GENERATE_RESPONSE_ADAPTER.dump_json(result),
+                media_type="application/json"
+            )
         
     except Exception as e:
-        logger.error(f"Error generating response: {e}")
+        logger.error("Error generating response: %s", e)
         
         # Log the error interaction
         error_data = {
             "response": f"Internal server error: {str(e)}",
             "model": "error",
-            "timestamp": datetime.now(),
+            "timestamp": datetime.now(timezone.utc),
             "duration_ms": 0,
             "success": False,
             "error_reason": str(e)
@@ -196,54 +318,56 @@ async def generate_response(request: GenerateRequest):
             detail=f"Failed to generate response: {str(e)}"
         )
 
-@app.get("/logs/recent", tags=["Logs"])
+@app.get("/logs/recent", tags=["Logs"], responses={500: {"model": ErrorResponse}})
 async def get_recent_logs(limit: int = 10):
     """Get recent interaction logs."""
     try:
         logs = interaction_logger.get_recent_logs(limit=limit)
-        return {"logs": logs, "count": len(logs)}
+        # Log entries are plain dicts, so hand them straight to orjson
+        # instead of walking them through jsonable_encoder
+        return ORJSONResponse({"logs": logs, "count": len(logs)})
     except Exception as e:
-        logger.error(f"Error retrieving logs: {e}")
+        logger.error("Error retrieving logs: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve logs: {str(e)}"
         )
 
-@app.get("/logs/stats", tags=["Logs"])
+@app.get("/logs/stats", tags=["Logs"], responses={500: {"model": ErrorResponse}})
 async def get_log_stats():
     """Get interaction statistics."""
     try:
         stats = interaction_logger.get_log_stats()
-        return stats
+        return ORJSONResponse(stats)
     except Exception as e:
-        logger.error(f"Error retrieving log stats: {e}")
+        logger.error("Error retrieving log stats: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve log stats: {str(e)}"
         )
 
+def error_response(status_code: int, error: str, detail: str = None) -> Response:
+    """Build an ErrorResponse-shaped JSON response without constructing and validating the model."""
+    body = orjson.dumps({
+        "error": error,
+        "detail": detail,
+        "timestamp": datetime.now(timezone.utc)
+    })
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Custom HTTP exception handler."""
-    return JSONResponse(
-        status_code=exc.status_code,
-        content=ErrorResponse(
-            error=exc.detail,
-            timestamp=datetime.now()
-        ).dict()
-    )
+    return error_response(exc.status_code, exc.detail)
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """General exception handler."""
-    logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content=ErrorResponse(
-            error="Internal server error",
-            detail=str(exc),
-            timestamp=datetime.now()
-        ).dict()
+    logger.error("Unhandled exception: %s", exc)
+    return error_response(
+        status.HTTP_500_INTERNAL_SERVER_ERROR,
+        "Internal server error",
+        detail=str(exc)
     )
 
 if __name__ == "__main__":
@@ -252,5 +376,20 @@ if __name__ == "__main__":
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", "8000"))
     
-    logger.info(f"Starting server on {host}:{port}")
-    uvicorn.run(app, host=host, port=port)
+    workers = int(os.getenv("API_WORKERS", "1"))
+    
+    logger.info(f"Starting server on {host}:{port} with {workers} worker(s)")
+    if workers > 1:
+        # Workers import their own copy of the app from the import string, so this
+        # process only supervises them and has no use for its logger's writer thread
+        interaction_logger.close()
+    
+    # uvloop is not available on Windows
+    uvicorn.run(
+        "app:app" if workers > 1 else app,
+        host=host,
+        port=port,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=workers
+    )
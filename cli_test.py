@@ -4,6 +4,8 @@ CLI tool for testing the MiniVault API.
 """
 
 import requests
+import httpx
+import asyncio
 import json
 import argparse
 import sys
@@ -13,12 +15,14 @@ from datetime import datetime
 class MiniVaultCLI:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url.rstrip("/")
+        # Reuse one keep-alive connection across calls
+        self.session = requests.Session()
     
     def test_health(self):
         """Test the health endpoint."""
         print("🔍 Testing health endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=5)
+            response = self.session.get(f"{self.base_url}/health", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 print("✅ Health check passed!")
@@ -44,7 +48,7 @@ class MiniVaultCLI:
         
         try:
             start_time = datetime.now()
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/generate",
                 json=payload,
                 timeout=60
@@ -72,11 +76,50 @@ class MiniVaultCLI:
             print(f"❌ Generation error: {e}")
             return False
     
+    async def _generate_parallel(self, prompt: str, count: int, model: str = None):
+        """Send count generate requests at once over a shared async client."""
+        payload = {"prompt": prompt}
+        if model:
+            payload["model"] = model
+        
+        limits = httpx.Limits(max_connections=count, max_keepalive_connections=count)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=60, limits=limits) as client:
+            return await asyncio.gather(
+                *[client.post("/generate", json=payload) for _ in range(count)],
+                return_exceptions=True
+            )
+    
+    def generate_parallel(self, prompt: str, count: int, model: str = None):
+        """Generate responses for the same prompt with count concurrent requests."""
+        print(f"⚡ Sending {count} concurrent requests for: '{prompt[:50]}{'...' if len(prompt) > 50 else ''}'")
+        
+        start_time = datetime.now()
+        results = asyncio.run(self._generate_parallel(prompt, count, model))
+        duration = (datetime.now() - start_time).total_seconds()
+        
+        succeeded = sum(
+            1 for r in results
+            if isinstance(r, httpx.Response) and r.status_code == 200
+        )
+        failed = count - succeeded
+        
+        if failed == 0:
+            print(f"✅ All {count} requests succeeded!")
+        else:
+            print(f"❌ {failed} of {count} requests failed")
+            for r in results:
+                if isinstance(r, Exception):
+                    print(f"   Error: {r}")
+                elif r.status_code != 200:
+                    print(f"   Status: {r.status_code}")
+        print(f"   Duration: {duration:.2f}s ({count / duration:.2f} req/s)")
+        return failed == 0
+    
     def get_recent_logs(self, limit: int = 5):
         """Get recent interaction logs."""
         print(f"📋 Getting {limit} recent logs...")
         try:
-            response = requests.get(f"{self.base_url}/logs/recent?limit={limit}", timeout=5)
+            response = self.session.get(f"{self.base_url}/logs/recent?limit={limit}", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 logs = data.get("logs", [])
@@ -104,7 +147,7 @@ class MiniVaultCLI:
         """Get interaction statistics."""
         print("📊 Getting interaction statistics...")
         try:
-            response = requests.get(f"{self.base_url}/logs/stats", timeout=5)
+            response = self.session.get(f"{self.base_url}/logs/stats", timeout=5)
             if response.status_code == 200:
                 stats = response.json()
                 print("✅ Statistics retrieved:")
@@ -170,6 +213,7 @@ def main():
     parser.add_argument("--health", action="store_true", help="Test health endpoint")
     parser.add_argument("--prompt", help="Generate response for prompt")
     parser.add_argument("--model", help="Model to use for generation")
+    parser.add_argument("--parallel", type=int, metavar="N", help="Send the prompt as N concurrent requests")
     parser.add_argument("--logs", action="store_true", help="Show recent logs")
     parser.add_argument("--stats", action="store_true", help="Show statistics")
     parser.add_argument("--interactive", "-i", action="store_true", help="Run in interactive mode")
@@ -183,6 +227,9 @@ def main():
     elif args.health:
         success = cli.test_health()
         sys.exit(0 if success else 1)
+    elif args.prompt and args.parallel:
+        success = cli.generate_parallel(args.prompt, args.parallel, args.model)
+        sys.exit(0 if success else 1)
     elif args.prompt:
         success = cli.generate_response(args.prompt, args.model)
         sys.exit(0 if success else 1)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 
 
@@ -25,11 +25,14 @@ class GenerateRequest(BaseModel):
         examples=[True, False]
     )
     
-    model_config = {
-        "json_schema_extra": {
+    model_config = ConfigDict(
+        extra="forbid",
+        validate_assignment=False,
+        defer_build=False,
+        json_schema_extra={
             "examples": [{
                 "prompt": "Explain quantum computing in simple terms",
                 "stream": False
             }]
         }
-    }
+    )
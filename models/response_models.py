@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from typing import Optional, List
 from datetime import datetime
 
@@ -23,15 +23,18 @@ class GenerateResponse(BaseModel):
         description="When the response was generated"
     )
     
-    model_config = {
-        "json_schema_extra": {
+    model_config = ConfigDict(
+        extra="forbid",
+        validate_assignment=False,
+        defer_build=False,
+        json_schema_extra={
             "examples": [{
                 "response": "Quantum computing is a revolutionary technology that uses quantum mechanics principles to process information in ways that classical computers cannot.",
                 "model": "llama2",
                 "timestamp": "2024-01-15T10:30:00Z"
             }]
         }
-    }
+    )
 
 
 class HealthResponse(BaseModel):
@@ -59,6 +62,12 @@ class HealthResponse(BaseModel):
         description="List of available Ollama models",
         examples=[["llama2", "codellama"]]
     )
+    
+    model_config = ConfigDict(
+        extra="forbid",
+        validate_assignment=False,
+        defer_build=False
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -80,3 +89,14 @@ class ErrorResponse(BaseModel):
         ...,
         description="Error timestamp"
     )
+    
+    model_config = ConfigDict(
+        extra="forbid",
+        validate_assignment=False,
+        defer_build=False
+    )
+
+
+# Serializers built once at import so endpoints can dump responses straight to JSON bytes
+GENERATE_RESPONSE_ADAPTER = TypeAdapter(GenerateResponse)
+HEALTH_RESPONSE_ADAPTER = TypeAdapter(HealthResponse)
@@ -1,12 +1,66 @@
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from urllib3.util.retry import Retry
+import httpx
 import os
-import json
-from typing import Optional, Dict, Any, List, Generator
-from datetime import datetime
+import re
+import orjson
+import time
+import threading
+from typing import Optional, Dict, Any, List, Generator, AsyncGenerator, Tuple
+from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on cached substitutes for missing models
+MAX_MODEL_SUBSTITUTES = 256
+
+# Simple fallback responses based on prompt content, used when Ollama is unavailable
+_FALLBACK_TABLE = {
+    "hello": "Hello! I'm a fallback response since the LLM service is currently unavailable.",
+    "what": "I'm sorry, I cannot provide a detailed answer right now as the LLM service is unavailable. This is a fallback response.",
+    "how": "I'd love to help explain that, but the LLM service is currently unavailable. This is a fallback response.",
+    "why": "That's an interesting question! Unfortunately, the LLM service is unavailable right now, so this is a fallback response.",
+    "explain": "I'd be happy to explain that topic, but the LLM service is currently unavailable. This is a fallback response."
+}
+_FALLBACK_DEFAULT = "I apologize, but the LLM service is currently unavailable. This is a fallback response to your prompt."
+# Matches the first table keyword that is a whole word, in a single pass over the prompt
+_FALLBACK_PATTERN = re.compile(r"\b(" + "|".join(map(re.escape, _FALLBACK_TABLE)) + r")\b", re.IGNORECASE)
+
+
+class _RetryingTransport(httpx.AsyncBaseTransport):
+    """Async transport retrying gateway errors, mirroring the requests session's Retry policy."""
+    
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        retries: int = 2,
+        backoff_factor: float = 0.1,
+        status_forcelist: Tuple[int, ...] = (502, 503, 504)
+    ):
+        self.transport = transport
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send the request, resending it with backoff while Ollama answers with a gateway error."""
+        for attempt in range(self.retries + 1):
+            response = await self.transport.handle_async_request(request)
+            if response.status_code not in self.status_forcelist or attempt == self.retries:
+                return response
+            # Ollama answered without generating anything, so the request is safe to resend
+            await response.aclose()
+            logger.warning(f"Retrying {request.method} {request.url.path} after {response.status_code}")
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+    
+    async def aclose(self):
+        """Close the wrapped transport's connections."""
+        await self.transport.aclose()
+
 
 class OllamaService:
     """Service for interacting with Ollama API."""
@@ -16,26 +70,183 @@ class OllamaService:
         self.default_model = default_model or os.getenv("OLLAMA_MODEL", "llama2")
         self.timeout = timeout
         
-    def is_available(self) -> bool:
-        """Check if Ollama service is available."""
+        # Pooled keep-alive connections shared by every call to Ollama. Failed
+        # connections and gateway errors (e.g. while Ollama restarts) are retried
+        # with a short backoff before a request falls back. Read errors are never
+        # retried: the POST reached Ollama, and resending it would repeat the generation
+        self.session = requests.Session()
+        retry = Retry(
+            total=2,
+            read=False,
+            backoff_factor=0.1,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # Result of the last /api/tags probe as (checked_at, available, models),
+        # reused for probe_ttl seconds
+        self.probe_ttl = float(os.getenv("OLLAMA_PROBE_TTL", "30"))
+        self._tags_cache: Optional[Tuple[float, bool, List[str]]] = None
+        self._cache_lock = threading.Lock()
+        
+        # Models used in place of requested ones Ollama reported missing, as
+        # {requested: (checked_at, substitute)}, reused for probe_ttl seconds
+        self._model_substitutes: Dict[str, Tuple[float, str]] = {}
+        
+        # Async client for use from the event loop, created on first use
+        self._aclient: Optional[httpx.AsyncClient] = None
+    
+    def close(self):
+        """Close pooled connections to Ollama."""
+        self.session.close()
+    
+    async def aclose(self):
+        """Close the async client's pooled connections to Ollama."""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the shared async client, creating it on first use."""
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                # httpx itself only retries failed connection attempts; gateway
+                # errors are retried by the wrapper, as on the requests session
+                transport=_RetryingTransport(
+                    httpx.AsyncHTTPTransport(
+                        retries=2,
+                        limits=httpx.Limits(
+                            max_connections=100,
+                            max_keepalive_connections=20,
+                            keepalive_expiry=30
+                        )
+                    )
+                )
+            )
+        return self._aclient
+    
+    def _cached_tags(self) -> Optional[Tuple[bool, List[str]]]:
+        """Return the cached /api/tags probe if it is still fresh."""
+        with self._cache_lock:
+            cached = self._tags_cache
+        if cached is not None and time.monotonic() - cached[0] < self.probe_ttl:
+            return cached[1], cached[2]
+        return None
+    
+    def _store_tags(self, response) -> Tuple[bool, List[str]]:
+        """Cache availability and the model list from an /api/tags response (None if the request failed)."""
+        available = response is not None and response.status_code == 200
+        models = []
+        if available:
+            try:
+                models = [model["name"] for model in response.json().get("models", [])]
+            except Exception as e:
+                logger.error(f"Failed to get available models: {e}")
+        
+        with self._cache_lock:
+            self._tags_cache = (time.monotonic(), available, models)
+        return available, models
+    
+    def _probe_tags(self) -> Tuple[bool, List[str]]:
+        """Query /api/tags once for both availability and the model list, caching the result."""
+        cached = self._cached_tags()
+        if cached is not None:
+            return cached
+        
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
         except Exception as e:
             logger.warning(f"Ollama service check failed: {e}")
-            return False
+            response = None
+        return self._store_tags(response)
+    
+    async def _aprobe_tags(self) -> Tuple[bool, List[str]]:
+        """Async counterpart of _probe_tags sharing the same cache."""
+        cached = self._cached_tags()
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await self._get_async_client().get("/api/tags", timeout=5)
+        except Exception as e:
+            logger.warning(f"Ollama service check failed: {e}")
+            response = None
+        return self._store_tags(response)
+    
+    def invalidate_cache(self):
+        """Forget the cached probe so the next check hits Ollama again."""
+        with self._cache_lock:
+            self._tags_cache = None
+    
+    def _known_unavailable(self) -> bool:
+        """Whether a recent probe or request found Ollama unreachable, without contacting it."""
+        cached = self._cached_tags()
+        return cached is not None and not cached[0]
+    
+    def _connection_error_reason(self, error: Exception) -> str:
+        """
+        Log a connection error talking to Ollama and return the fallback reason for it.
+        
+        Only a failure to connect at all marks Ollama unavailable for probe_ttl seconds;
+        a connection dropped mid-request just invalidates the cached probe.
+        """
+        unreachable = isinstance(error, (requests.exceptions.ConnectTimeout, httpx.ConnectError, httpx.ConnectTimeout))
+        if not unreachable and error.args:
+            # requests reports a refused connection as MaxRetryError(reason=NewConnectionError)
+            reason = error.args[0]
+            unreachable = isinstance(reason, MaxRetryError) and isinstance(reason.reason, NewConnectionError)
+        
+        if unreachable:
+            logger.warning(f"Ollama service unavailable: {error}")
+            self._store_tags(None)
+            return "Ollama service unavailable"
+        
+        logger.error(f"Ollama connection failed: {error}")
+        self.invalidate_cache()
+        return str(error)
+    
+    def is_available(self) -> bool:
+        """Check if Ollama service is available."""
+        return self._probe_tags()[0]
     
     def get_available_models(self) -> List[str]:
         """Get list of available models from Ollama."""
+        return list(self._probe_tags()[1])
+    
+    def warm_up(self, model: Optional[str] = None) -> bool:
+        """
+        Load a model into Ollama's memory ahead of the first request.
+        
+        Ollama loads the model without generating anything when given an empty prompt.
+        
+        Args:
+            model: Optional model name (uses default if not provided)
+            
+        Returns:
+            True if the model was loaded
+        """
+        model_name = model or self.default_model
+        
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model_name, "prompt": "", "stream": False},
+                timeout=self.timeout
+            )
             if response.status_code == 200:
-                data = response.json()
-                return [model["name"] for model in data.get("models", [])]
-            return []
+                logger.info(f"Warmed up model: {model_name}")
+                return True
+            logger.warning(f"Failed to warm up model {model_name}: {response.status_code} - {response.text}")
+            return False
         except Exception as e:
-            logger.error(f"Failed to get available models: {e}")
-            return []
+            logger.warning(f"Failed to warm up model {model_name}: {e}")
+            return False
     
     def generate_response(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -48,25 +259,14 @@ class OllamaService:
         Returns:
             Dict containing response, model, and metadata
         """
-        model_name = model or self.default_model
+        model_name = self._resolve_model(model or self.default_model)
         
-        # Check if Ollama is available
-        if not self.is_available():
+        # Skip the request while a recent check found Ollama unreachable
+        if self._known_unavailable():
             return self._get_fallback_response(prompt, model_name, "Ollama service unavailable")
         
-        # Check if requested model is available
-        available_models = self.get_available_models()
-        if available_models and model_name not in available_models:
-            logger.warning(f"Model {model_name} not available. Available models: {available_models}")
-            # Try to use the first available model as fallback
-            if available_models:
-                model_name = available_models[0]
-                logger.info(f"Using fallback model: {model_name}")
-            else:
-                return self._get_fallback_response(prompt, model_name, "No models available")
-        
         try:
-            start_time = datetime.now()
+            start_time = time.monotonic_ns()
             
             payload = {
                 "model": model_name,
@@ -74,38 +274,45 @@ class OllamaService:
                 "stream": False
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/generate",
                 json=payload,
                 timeout=self.timeout
             )
             
-            end_time = datetime.now()
-            duration_ms = int((end_time - start_time).total_seconds() * 1000)
+            # The model name is only checked against the installed models when Ollama rejects it
+            if response.status_code == 404:
+                substitute = self._substitute_model(model_name)
+                if substitute is not None:
+                    model_name = payload["model"] = substitute
+                    response = self.session.post(
+                        f"{self.base_url}/api/generate",
+                        json=payload,
+                        timeout=self.timeout
+                    )
             
             if response.status_code == 200:
-                data = response.json()
-                return {
-                    "response": data.get("response", "").strip(),
-                    "model": model_name,
-                    "timestamp": end_time,
-                    "duration_ms": duration_ms,
-                    "success": True
-                }
+                return self._build_response(response.json(), model_name, start_time)
             else:
                 logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                self.invalidate_cache()
                 return self._get_fallback_response(
                     prompt, 
                     model_name, 
                     f"API error: {response.status_code}"
                 )
                 
+        except requests.exceptions.ConnectionError as e:
+            # Also covers ConnectTimeout
+            return self._get_fallback_response(prompt, model_name, self._connection_error_reason(e))
+            
         except requests.exceptions.Timeout:
             logger.error(f"Ollama request timeout after {self.timeout}s")
             return self._get_fallback_response(prompt, model_name, "Request timeout")
             
         except Exception as e:
             logger.error(f"Ollama generation failed: {e}")
+            self.invalidate_cache()
             return self._get_fallback_response(prompt, model_name, str(e))
     
     def generate_response_stream(self, prompt: str, model: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
@@ -119,27 +326,15 @@ class OllamaService:
         Yields:
             Dict containing token, model, and metadata for each chunk
         """
-        model_name = model or self.default_model
+        model_name = self._resolve_model(model or self.default_model)
         
-        # Check if Ollama is available
-        if not self.is_available():
+        # Skip the request while a recent check found Ollama unreachable
+        if self._known_unavailable():
             yield self._get_fallback_stream_response(prompt, model_name, "Ollama service unavailable")
             return
         
-        # Check if requested model is available
-        available_models = self.get_available_models()
-        if available_models and model_name not in available_models:
-            logger.warning(f"Model {model_name} not available. Available models: {available_models}")
-            # Try to use the first available model as fallback
-            if available_models:
-                model_name = available_models[0]
-                logger.info(f"Using fallback model: {model_name}")
-            else:
-                yield self._get_fallback_stream_response(prompt, model_name, "No models available")
-                return
-        
         try:
-            start_time = datetime.now()
+            start_time = time.monotonic_ns()
             
             payload = {
                 "model": model_name,
@@ -147,87 +342,345 @@ class OllamaService:
                 "stream": True
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/generate",
                 json=payload,
                 timeout=self.timeout,
                 stream=True
             )
             
-            if response.status_code == 200:
-                full_response = ""
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            chunk_data = json.loads(line.decode('utf-8'))
-                            token = chunk_data.get("response", "")
-                            done = chunk_data.get("done", False)
-                            
-                            if token:
-                                full_response += token
-                                yield {
-                                    "token": token,
-                                    "model": model_name,
-                                    "timestamp": datetime.now().isoformat(),
-                                    "done": done,
-                                    "success": True
-                                }
-                            
-                            if done:
-                                end_time = datetime.now()
-                                duration_ms = int((end_time - start_time).total_seconds() * 1000)
-                                yield {
-                                    "token": "",
-                                    "model": model_name,
-                                    "timestamp": end_time.isoformat(),
-                                    "done": True,
-                                    "success": True,
-                                    "duration_ms": duration_ms,
-                                    "full_response": full_response.strip()
-                                }
+            # The model name is only checked against the installed models when Ollama rejects it
+            if response.status_code == 404:
+                substitute = self._substitute_model(model_name)
+                if substitute is not None:
+                    response.close()
+                    model_name = payload["model"] = substitute
+                    response = self.session.post(
+                        f"{self.base_url}/api/generate",
+                        json=payload,
+                        timeout=self.timeout,
+                        stream=True
+                    )
+            
+            # Closing the streamed response hands its connection back to the pool
+            with response:
+                if response.status_code == 200:
+                    parts = []
+                    buf = bytearray()
+                    done = False
+                    # Split the NDJSON body ourselves so each line is parsed as soon as it arrives
+                    for data in response.iter_content(chunk_size=4096):
+                        buf += data
+                        while not done:
+                            end = buf.find(b"\n")
+                            if end == -1:
                                 break
-                                
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Failed to parse streaming response: {e}")
-                            continue
+                            line = bytes(buf[:end])
+                            del buf[:end + 1]
+                            if line.strip():
+                                chunks, done = self._stream_chunks(line, model_name, parts, start_time)
+                                yield from chunks
+                        if done:
+                            break
+                    
+                    # The last line may not be newline-terminated
+                    if not done and buf.strip():
+                        chunks, done = self._stream_chunks(bytes(buf), model_name, parts, start_time)
+                        yield from chunks
+                else:
+                    logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                    self.invalidate_cache()
+                    yield self._get_fallback_stream_response(prompt, model_name, f"API error: {response.status_code}")
+                    
+        except requests.exceptions.ConnectionError as e:
+            # Also covers ConnectTimeout
+            yield self._get_fallback_stream_response(prompt, model_name, self._connection_error_reason(e))
+            
+        except requests.exceptions.Timeout:
+            logger.error(f"Ollama request timeout after {self.timeout}s")
+            yield self._get_fallback_stream_response(prompt, model_name, "Request timeout")
+            
+        except Exception as e:
+            logger.error(f"Ollama streaming failed: {e}")
+            self.invalidate_cache()
+            yield self._get_fallback_stream_response(prompt, model_name, str(e))
+    
+    async def agenerate_response(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate a response using Ollama without blocking the event loop.
+        
+        Args:
+            prompt: The input prompt
+            model: Optional model name (uses default if not provided)
+            
+        Returns:
+            Dict containing response, model, and metadata
+        """
+        model_name = self._resolve_model(model or self.default_model)
+        
+        # Skip the request while a recent check found Ollama unreachable
+        if self._known_unavailable():
+            return self._get_fallback_response(prompt, model_name, "Ollama service unavailable")
+        
+        try:
+            start_time = time.monotonic_ns()
+            
+            payload = {
+                "model": model_name,
+                "prompt": prompt,
+                "stream": False
+            }
+            
+            client = self._get_async_client()
+            response = await client.post("/api/generate", json=payload)
+            
+            # The model name is only checked against the installed models when Ollama rejects it
+            if response.status_code == 404:
+                substitute = await self._asubstitute_model(model_name)
+                if substitute is not None:
+                    model_name = payload["model"] = substitute
+                    response = await client.post("/api/generate", json=payload)
+            
+            if response.status_code == 200:
+                return self._build_response(response.json(), model_name, start_time)
             else:
                 logger.error(f"Ollama API error: {response.status_code} - {response.text}")
-                yield self._get_fallback_stream_response(prompt, model_name, f"API error: {response.status_code}")
+                self.invalidate_cache()
+                return self._get_fallback_response(
+                    prompt,
+                    model_name,
+                    f"API error: {response.status_code}"
+                )
                 
-        except requests.exceptions.Timeout:
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            return self._get_fallback_response(prompt, model_name, self._connection_error_reason(e))
+            
+        except httpx.TimeoutException:
+            logger.error(f"Ollama request timeout after {self.timeout}s")
+            return self._get_fallback_response(prompt, model_name, "Request timeout")
+            
+        except Exception as e:
+            logger.error(f"Ollama generation failed: {e}")
+            self.invalidate_cache()
+            return self._get_fallback_response(prompt, model_name, str(e))
+    
+    async def agenerate_response_stream(self, prompt: str, model: Optional[str] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Generate a streaming response using Ollama without blocking the event loop.
+        
+        Args:
+            prompt: The input prompt
+            model: Optional model name (uses default if not provided)
+            
+        Yields:
+            Dict containing token, model, and metadata for each chunk
+        """
+        model_name = self._resolve_model(model or self.default_model)
+        
+        # Skip the request while a recent check found Ollama unreachable
+        if self._known_unavailable():
+            yield self._get_fallback_stream_response(prompt, model_name, "Ollama service unavailable")
+            return
+        
+        try:
+            start_time = time.monotonic_ns()
+            
+            payload = {
+                "model": model_name,
+                "prompt": prompt,
+                "stream": True
+            }
+            
+            client = self._get_async_client()
+            response = await client.send(client.build_request("POST", "/api/generate", json=payload), stream=True)
+            
+            # The model name is only checked against the installed models when Ollama rejects it
+            if response.status_code == 404:
+                substitute = await self._asubstitute_model(model_name)
+                if substitute is not None:
+                    await response.aclose()
+                    model_name = payload["model"] = substitute
+                    response = await client.send(client.build_request("POST", "/api/generate", json=payload), stream=True)
+            
+            try:
+                if response.status_code == 200:
+                    parts = []
+                    async for line in response.aiter_lines():
+                        if line:
+                            chunks, done = self._stream_chunks(line, model_name, parts, start_time)
+                            for chunk in chunks:
+                                yield chunk
+                            if done:
+                                break
+                else:
+                    await response.aread()
+                    logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                    self.invalidate_cache()
+                    yield self._get_fallback_stream_response(prompt, model_name, f"API error: {response.status_code}")
+            finally:
+                # Hands the connection back to the pool
+                await response.aclose()
+            
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            yield self._get_fallback_stream_response(prompt, model_name, self._connection_error_reason(e))
+            
+        except httpx.TimeoutException:
             logger.error(f"Ollama request timeout after {self.timeout}s")
             yield self._get_fallback_stream_response(prompt, model_name, "Request timeout")
             
         except Exception as e:
             logger.error(f"Ollama streaming failed: {e}")
+            self.invalidate_cache()
             yield self._get_fallback_stream_response(prompt, model_name, str(e))
     
-    def _get_fallback_response(self, prompt: str, model: str, error_reason: str) -> Dict[str, Any]:
-        """Generate a fallback response when Ollama is unavailable."""
-        logger.info(f"Using fallback response due to: {error_reason}")
+    async def generate_many(self, prompts: List[str], model: Optional[str] = None, concurrency: int = 8) -> List[Any]:
+        """
+        Generate responses for several prompts concurrently.
+        
+        Ollama serves up to OLLAMA_NUM_PARALLEL requests per model at once (configured on
+        the Ollama server); anything beyond that is queued server-side, so concurrency
+        should roughly match it.
         
-        # Simple fallback responses based on prompt content
-        fallback_responses = {
-            "hello": "Hello! I'm a fallback response since the LLM service is currently unavailable.",
-            "what": "I'm sorry, I cannot provide a detailed answer right now as the LLM service is unavailable. This is a fallback response.",
-            "how": "I'd love to help explain that, but the LLM service is currently unavailable. This is a fallback response.",
-            "why": "That's an interesting question! Unfortunately, the LLM service is unavailable right now, so this is a fallback response.",
-            "explain": "I'd be happy to explain that topic, but the LLM service is currently unavailable. This is a fallback response."
+        Args:
+            prompts: The input prompts
+            model: Optional model name (uses default if not provided)
+            concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            List of response dicts in prompt order, with the exception in place of any that failed
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _generate_one(prompt: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.agenerate_response(prompt, model)
+        
+        return await asyncio.gather(
+            *[_generate_one(prompt) for prompt in prompts],
+            return_exceptions=True
+        )
+    
+    def _resolve_model(self, model_name: str) -> str:
+        """Return the model substituted for model_name after a recent 404, or model_name itself."""
+        with self._cache_lock:
+            cached = self._model_substitutes.get(model_name)
+        if cached is not None and time.monotonic() - cached[0] < self.probe_ttl:
+            return cached[1]
+        return model_name
+    
+    def _substitute_model(self, model_name: str) -> Optional[str]:
+        """Pick an installed model to use after Ollama reported model_name missing (None if there is none)."""
+        # The cached model list may be what sent us to a missing model
+        self.invalidate_cache()
+        return self._remember_substitute(model_name, self.get_available_models())
+    
+    async def _asubstitute_model(self, model_name: str) -> Optional[str]:
+        """Async counterpart of _substitute_model."""
+        self.invalidate_cache()
+        _, available_models = await self._aprobe_tags()
+        return self._remember_substitute(model_name, available_models)
+    
+    def _remember_substitute(self, model_name: str, available_models: List[str]) -> Optional[str]:
+        """Select and cache a substitute so later requests for model_name skip the failed attempt."""
+        substitute = self._select_model(model_name, available_models)
+        if substitute == model_name:
+            return None
+        now = time.monotonic()
+        with self._cache_lock:
+            # Model names come from clients, so drop expired entries and keep the cache bounded
+            for name, (checked_at, _) in list(self._model_substitutes.items()):
+                if now - checked_at >= self.probe_ttl:
+                    del self._model_substitutes[name]
+            if len(self._model_substitutes) >= MAX_MODEL_SUBSTITUTES:
+                del self._model_substitutes[next(iter(self._model_substitutes))]
+            self._model_substitutes[model_name] = (now, substitute)
+        return substitute
+    
+    def _select_model(self, model_name: str, available_models: List[str]) -> str:
+        """Fall back to the first installed model when the requested one is not available."""
+        if available_models and model_name not in available_models:
+            logger.warning(f"Model {model_name} not available. Available models: {available_models}")
+            model_name = available_models[0]
+            logger.info(f"Using fallback model: {model_name}")
+        return model_name
+    
+    def _build_response(self, data: Dict[str, Any], model_name: str, start_time: int) -> Dict[str, Any]:
+        """Build the result dict for a completed (non-streaming) generation started at start_time (monotonic ns)."""
+        # Durations come from the monotonic clock so wall-clock adjustments can't skew them
+        duration_ms = (time.monotonic_ns() - start_time) // 1_000_000
+        return {
+            "response": data.get("response", "").strip(),
+            "model": model_name,
+            "timestamp": datetime.now(timezone.utc),
+            "duration_ms": duration_ms,
+            "success": True
         }
+    
+    def _stream_chunks(self, line, model_name: str, parts: List[str], start_time: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Convert one NDJSON line from Ollama's streaming API into chunks for the client.
+        
+        Args:
+            line: Raw JSON line (bytes or str, parsed without decoding)
+            model_name: Model used for generation
+            parts: Tokens received so far, extended in place
+            start_time: When the generation started, from time.monotonic_ns()
+            
+        Returns:
+            Tuple of (chunks to yield, whether generation is done)
+        """
+        try:
+            chunk_data = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Failed to parse streaming response: {e}")
+            return [], False
+        
+        token = chunk_data.get("response", "")
+        done = chunk_data.get("done", False)
+        chunks = []
+        
+        if token:
+            parts.append(token)
+            chunks.append({
+                "token": token,
+                "model": model_name,
+                # Ollama stamps every chunk already; only read the clock if it didn't
+                "timestamp": chunk_data.get("created_at") or datetime.now(timezone.utc).isoformat(),
+                "done": done,
+                "success": True
+            })
         
-        # Find appropriate fallback based on prompt content
-        prompt_lower = prompt.lower()
-        fallback_text = "I apologize, but the LLM service is currently unavailable. This is a fallback response to your prompt."
+        if done:
+            duration_ms = (time.monotonic_ns() - start_time) // 1_000_000
+            chunks.append({
+                "token": "",
+                "model": model_name,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "done": True,
+                "success": True,
+                "duration_ms": duration_ms,
+                "full_response": "".join(parts).strip()
+            })
         
-        for keyword, response in fallback_responses.items():
-            if keyword in prompt_lower:
-                fallback_text = response
-                break
+        return chunks, done
+    
+    def _pick_fallback_text(self, prompt: str) -> str:
+        """Find an appropriate fallback text based on prompt content."""
+        match = _FALLBACK_PATTERN.search(prompt)
+        if match:
+            return _FALLBACK_TABLE[match.group(1).lower()]
+        return _FALLBACK_DEFAULT
+    
+    def _get_fallback_response(self, prompt: str, model: str, error_reason: str) -> Dict[str, Any]:
+        """Generate a fallback response when Ollama is unavailable."""
+        logger.info(f"Using fallback response due to: {error_reason}")
+        
+        fallback_text = self._pick_fallback_text(prompt)
         
         return {
             "response": fallback_text,
             "model": f"{model} (fallback)",
-            "timestamp": datetime.now(),
+            "timestamp": datetime.now(timezone.utc),
             "duration_ms": 0,
             "success": False,
             "error_reason": error_reason
@@ -237,28 +690,12 @@ class OllamaService:
         """Generate a fallback streaming response when Ollama is unavailable."""
         logger.info(f"Using fallback streaming response due to: {error_reason}")
         
-        # Simple fallback responses based on prompt content
-        fallback_responses = {
-            "hello": "Hello! I'm a fallback response since the LLM service is currently unavailable.",
-            "what": "I'm sorry, I cannot provide a detailed answer right now as the LLM service is unavailable. This is a fallback response.",
-            "how": "I'd love to help explain that, but the LLM service is currently unavailable. This is a fallback response.",
-            "why": "That's an interesting question! Unfortunately, the LLM service is unavailable right now, so this is a fallback response.",
-            "explain": "I'd be happy to explain that topic, but the LLM service is currently unavailable. This is a fallback response."
-        }
-        
-        # Find appropriate fallback based on prompt content
-        prompt_lower = prompt.lower()
-        fallback_text = "I apologize, but the LLM service is currently unavailable. This is a fallback response to your prompt."
-        
-        for keyword, response in fallback_responses.items():
-            if keyword in prompt_lower:
-                fallback_text = response
-                break
+        fallback_text = self._pick_fallback_text(prompt)
         
         return {
             "token": fallback_text,
             "model": f"{model} (fallback)",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
             "done": True,
             "success": False,
             "error_reason": error_reason,
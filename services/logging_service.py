@@ -1,38 +1,141 @@
-import json
+import orjson
 import os
-from datetime import datetime
-from typing import Dict, Any
+import queue
+import zlib
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List
 import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Queued by close() to tell the writer thread to exit
+_STOP = object()
+
+# Running totals persisted next to the log. inode identifies the log file, offset is
+# how far into it they cover, and tail_start/tail_crc locate and checksum the last
+# line counted, so a log truncated in place and grown again is not mistaken for the old one
+_EMPTY_STATS = {
+    "inode": 0, "offset": 0, "tail_start": 0, "tail_crc": 0,
+    "total": 0, "successful": 0, "failed": 0, "sum_duration": 0
+}
+
+# Block size used when reading the log backwards for recent entries
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def _tail_lines(path: str, limit: int) -> List[bytes]:
+    """
+    Read the last lines of a file without loading the whole file.
+    
+    Args:
+        path: File to read
+        limit: Maximum number of non-empty lines to return
+        
+    Returns:
+        Up to `limit` lines, oldest first, without their trailing newlines
+    """
+    if limit <= 0:
+        return []
+    
+    blocks = []
+    newlines = 0
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        # The file ends with a newline, so limit + 1 of them bound the last `limit` lines
+        while pos > 0 and newlines <= limit:
+            step = min(TAIL_BLOCK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+    
+    lines = b"".join(reversed(blocks)).split(b"\n")
+    # The first piece may be a partial line unless the scan reached the start of the file
+    if pos > 0:
+        lines = lines[1:]
+    return [line for line in lines if line.strip()][-limit:]
+
 
 class InteractionLogger:
     """Service for logging API interactions to JSONL format."""
     
-    def __init__(self, log_file: str = "logs/log.jsonl"):
+    def __init__(
+        self,
+        log_file: str = "logs/log.jsonl",
+        queue_size: int = 10_000,
+        batch_size: int = 256,
+        batch_window: float = 0.05
+    ):
+        """
+        Args:
+            log_file: Path of the JSONL log file
+            queue_size: Maximum number of entries waiting to be written before new ones are dropped
+            batch_size: Maximum number of entries appended per write
+            batch_window: Seconds to wait for more entries before writing a batch
+        """
         self.log_file = log_file
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        # Guards the file descriptor's lifecycle; appends themselves need no lock
         self.lock = threading.Lock()
         self._ensure_log_directory()
+        # Long-lived append-only descriptor: each write(2) lands atomically at the end of the file
+        self._fd = self._open_log()
+        
+        # Callers only enqueue serialized entries; a daemon thread does the disk I/O
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="interaction-log-writer", daemon=True)
+        self._writer.start()
+        
+        # Stats are folded in incrementally from the log, shared by every process writing to it
+        self.stats_file = os.path.splitext(self.log_file)[0] + ".stats.json"
+        self._stats_lock = threading.Lock()
+        self._stats = self._load_stats()
+    
+    def flush(self):
+        """Block until every queued entry has been written, or return at once if the writer has stopped."""
+        # Like Queue.join(), but gives up once the writer exits, since entries
+        # racing with close() may never be written
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._writer.is_alive():
+                self._queue.all_tasks_done.wait(0.1)
+    
+    def close(self):
+        """Write out queued entries, stop the writer thread and close the log file descriptor."""
+        self._closed = True
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        
+        try:
+            self._refresh_stats()
+        except Exception as e:
+            logger.error(f"Failed to update log stats: {e}")
+        
+        with self.lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
     
     def _ensure_log_directory(self):
         """Create logs directory if it doesn't exist."""
         log_dir = os.path.dirname(self.log_file)
-        if log_dir and not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            logger.info(f"Created log directory: {log_dir}")
+        if log_dir:
+            # exist_ok avoids a check-then-create race between workers starting together
+            os.makedirs(log_dir, exist_ok=True)
     
-    def log_interaction(self, prompt: str, response_data: Dict[str, Any]):
-        """
-        Log an interaction to the JSONL file.
-        
-        Args:
-            prompt: The input prompt
-            response_data: Dict containing response, model, timestamp, etc.
-        """
+    def _build_entry(self, prompt: str, response_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a JSONL log entry from a prompt and its response data."""
+        # Only read the clock when the caller did not supply a timestamp
+        timestamp = response_data.get("timestamp") or datetime.now(timezone.utc)
         log_entry = {
-            "timestamp": response_data.get("timestamp", datetime.now()).isoformat(),
+            "timestamp": timestamp,
             "prompt": prompt,
             "response": response_data.get("response", ""),
             "model": response_data.get("model", "unknown"),
@@ -44,15 +147,176 @@ class InteractionLogger:
         if "error_reason" in response_data:
             log_entry["error_reason"] = response_data["error_reason"]
         
+        return log_entry
+    
+    def log_interaction(self, prompt: str, response_data: Dict[str, Any]):
+        """
+        Queue an interaction to be appended to the JSONL file by the writer thread.
+        
+        Never blocks: if the queue is full, or the logger has been closed, the entry
+        is dropped and counted in `dropped`.
+        
+        Args:
+            prompt: The input prompt
+            response_data: Dict containing response, model, timestamp, etc.
+        """
+        if self._closed:
+            self.dropped += 1
+            logger.warning("Interaction logger is closed - dropping log entry")
+            return
+        
+        try:
+            # orjson emits UTF-8 bytes with datetimes serialized natively
+            entry = orjson.dumps(self._build_entry(prompt, response_data), option=orjson.OPT_APPEND_NEWLINE)
+        except Exception as e:
+            logger.error(f"Failed to serialize interaction: {e}")
+            return
+        
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Interaction log queue is full - dropped {self.dropped} entries so far")
+    
+    def _write_loop(self):
+        """Drain the queue, appending up to batch_size entries or batch_window seconds' worth per write."""
+        stopping = False
+        while not stopping:
+            batch: List[bytes] = []
+            item = self._queue.get()
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+                deadline = time.monotonic() + self.batch_window
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+            
+            try:
+                if batch:
+                    self._write(b"".join(batch))
+                    logger.debug(f"Logged {len(batch)} interaction(s) to {self.log_file}")
+            except Exception as e:
+                logger.error(f"Failed to log interaction: {e}")
+            finally:
+                for _ in range(len(batch) + stopping):
+                    self._queue.task_done()
+    
+    def _open_log(self) -> int:
+        """Open the log file for appending, creating it if needed."""
+        return os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    
+    def _reopen_if_moved(self):
+        """Reopen the log file if it was moved or deleted (e.g. rotated) since it was opened."""
         try:
+            current = os.stat(self.log_file)
+            opened = os.fstat(self._fd)
+            moved = (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+        except FileNotFoundError:
+            moved = True
+        
+        if moved:
             with self.lock:
-                with open(self.log_file, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+                os.close(self._fd)
+                self._fd = self._open_log()
+            logger.info(f"Reopened log file {self.log_file}")
+    
+    def _write(self, data: bytes):
+        """Append data to the log file, looping in case write() comes up short."""
+        self._reopen_if_moved()
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+    
+    def _load_stats(self) -> Dict[str, int]:
+        """Load persisted stats, starting from zero if there are none."""
+        try:
+            with open(self.stats_file, "rb") as f:
+                stats = orjson.loads(f.read())
+            if isinstance(stats, dict) and _EMPTY_STATS.keys() <= stats.keys():
+                return stats
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable stats file {self.stats_file}: {e}")
+        return dict(_EMPTY_STATS)
+    
+    def _save_stats(self):
+        """Persist stats atomically so concurrent readers never see a partial file."""
+        tmp_file = f"{self.stats_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(orjson.dumps(self._stats))
+        os.replace(tmp_file, self.stats_file)
+    
+    def _tail_matches(self, f, stats: Dict[str, int]) -> bool:
+        """Whether the last line counted in stats is still in place in the open log file."""
+        if stats["offset"] == 0:
+            return True
+        f.seek(stats["tail_start"])
+        return zlib.crc32(f.read(stats["offset"] - stats["tail_start"])) == stats["tail_crc"]
+    
+    def _refresh_stats(self) -> Dict[str, int]:
+        """Fold log lines appended since the last refresh into the running stats and return a snapshot."""
+        with self._stats_lock, open(self.log_file, "rb") as f:
+            stat = os.fstat(f.fileno())
             
-            logger.debug(f"Logged interaction to {self.log_file}")
+            # Another worker may already have covered more of the same log
+            saved = self._load_stats()
+            if saved["inode"] == stat.st_ino and (
+                self._stats["inode"] != stat.st_ino or saved["offset"] > self._stats["offset"]
+            ):
+                self._stats = saved
             
-        except Exception as e:
-            logger.error(f"Failed to log interaction: {e}")
+            if (
+                self._stats["inode"] != stat.st_ino
+                or stat.st_size < self._stats["offset"]
+                or not self._tail_matches(f, self._stats)
+            ):
+                # The log was rotated or truncated; persist the reset right away so
+                # the old totals are never loaded again once the new log grows
+                self._stats = dict(_EMPTY_STATS, inode=stat.st_ino)
+                self._save_stats()
+            if stat.st_size == self._stats["offset"]:
+                return dict(self._stats)
+            
+            stats = self._stats
+            last_line = None
+            f.seek(stats["offset"])
+            for line in f:
+                # A line still being written is picked up on the next refresh
+                if not line.endswith(b"\n"):
+                    break
+                stats["tail_start"] = stats["offset"]
+                stats["offset"] += len(line)
+                last_line = line
+                
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                
+                stats["total"] += 1
+                if entry.get("success", True):
+                    stats["successful"] += 1
+                else:
+                    stats["failed"] += 1
+                stats["sum_duration"] += entry.get("duration_ms", 0)
+            
+            if last_line is not None:
+                stats["tail_crc"] = zlib.crc32(last_line)
+            self._save_stats()
+            return dict(stats)
     
     def get_recent_logs(self, limit: int = 10) -> list:
         """
@@ -68,18 +332,15 @@ class InteractionLogger:
             return []
         
         try:
-            with open(self.log_file, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            
-            # Get the last 'limit' lines
-            recent_lines = lines[-limit:] if len(lines) > limit else lines
+            # Only the tail of the file is read and parsed
+            recent_lines = _tail_lines(self.log_file, limit)
             
             # Parse JSON lines
             logs = []
             for line in recent_lines:
                 try:
-                    logs.append(json.loads(line.strip()))
-                except json.JSONDecodeError as e:
+                    logs.append(orjson.loads(line))
+                except orjson.JSONDecodeError as e:
                     logger.warning(f"Failed to parse log line: {e}")
             
             return logs
@@ -104,33 +365,15 @@ class InteractionLogger:
             }
         
         try:
-            total = 0
-            successful = 0
-            failed = 0
-            total_duration = 0
-            
-            with open(self.log_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        entry = json.loads(line.strip())
-                        total += 1
-                        
-                        if entry.get("success", True):
-                            successful += 1
-                        else:
-                            failed += 1
-                        
-                        total_duration += entry.get("duration_ms", 0)
-                        
-                    except json.JSONDecodeError:
-                        continue
-            
-            avg_duration = total_duration / total if total > 0 else 0
+            # Only lines appended since the last call are parsed
+            stats = self._refresh_stats()
+            total = stats["total"]
+            avg_duration = stats["sum_duration"] / total if total > 0 else 0
             
             return {
                 "total_interactions": total,
-                "successful_interactions": successful,
-                "failed_interactions": failed,
+                "successful_interactions": stats["successful"],
+                "failed_interactions": stats["failed"],
                 "average_duration_ms": round(avg_duration, 2)
             }
             
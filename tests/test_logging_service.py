@@ -0,0 +1,120 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.logging_service import InteractionLogger
+
+
+def _log(logger, count, success):
+    for i in range(count):
+        logger.log_interaction(f"prompt {i}", {"response": "ok", "duration_ms": 10, "success": success})
+    logger.flush()
+
+
+def test_stats_reset_after_truncation(tmp_path):
+    """Stats start over when the log is truncated, even once it grows past the old offset."""
+    log_file = str(tmp_path / "log.jsonl")
+    logger = InteractionLogger(log_file)
+    try:
+        _log(logger, 3, success=False)
+        assert logger.get_log_stats()["failed_interactions"] == 3
+
+        os.truncate(log_file, 0)
+        assert logger.get_log_stats()["total_interactions"] == 0
+
+        _log(logger, 5, success=True)
+        stats = logger.get_log_stats()
+        assert stats["total_interactions"] == 5
+        assert stats["successful_interactions"] == 5
+        assert stats["failed_interactions"] == 0
+    finally:
+        logger.close()
+
+
+def test_stats_reset_after_truncation_and_growth(tmp_path):
+    """An in-place truncation is caught even once the log has grown past the old offset."""
+    log_file = str(tmp_path / "log.jsonl")
+    logger = InteractionLogger(log_file)
+    try:
+        _log(logger, 3, success=False)
+        assert logger.get_log_stats()["failed_interactions"] == 3
+
+        os.truncate(log_file, 0)
+        _log(logger, 10, success=True)
+
+        stats = logger.get_log_stats()
+        assert stats["total_interactions"] == 10
+        assert stats["failed_interactions"] == 0
+        assert stats["average_duration_ms"] == 10
+    finally:
+        logger.close()
+
+
+def test_stats_reset_after_rotation(tmp_path):
+    """A log rotated under a running logger is recognized by its inode rather than its size."""
+    log_file = str(tmp_path / "log.jsonl")
+    logger = InteractionLogger(log_file)
+    try:
+        _log(logger, 3, success=False)
+        assert logger.get_log_stats()["total_interactions"] == 3
+
+        os.replace(log_file, log_file + ".1")
+
+        _log(logger, 5, success=True)
+        stats = logger.get_log_stats()
+        assert stats["total_interactions"] == 5
+        assert stats["failed_interactions"] == 0
+    finally:
+        logger.close()
+
+
+def test_stats_shared_between_loggers(tmp_path):
+    """Loggers appending to the same file see each other's entries."""
+    log_file = str(tmp_path / "log.jsonl")
+    first = InteractionLogger(log_file)
+    second = InteractionLogger(log_file)
+    try:
+        _log(first, 2, success=True)
+        assert first.get_log_stats()["total_interactions"] == 2
+
+        _log(second, 3, success=False)
+        for logger in (first, second):
+            stats = logger.get_log_stats()
+            assert stats["total_interactions"] == 5
+            assert stats["failed_interactions"] == 3
+    finally:
+        first.close()
+        second.close()
+
+
+def test_writes_follow_moved_log(tmp_path):
+    """A running logger recreates the log file after it is moved away."""
+    log_file = str(tmp_path / "log.jsonl")
+    logger = InteractionLogger(log_file)
+    try:
+        logger.log_interaction("before", {"response": "ok"})
+        logger.flush()
+
+        os.replace(log_file, log_file + ".1")
+
+        logger.log_interaction("after", {"response": "ok"})
+        logger.flush()
+        assert [entry["prompt"] for entry in logger.get_recent_logs(10)] == ["after"]
+        assert logger.get_log_stats()["total_interactions"] == 1
+    finally:
+        logger.close()
+
+    with open(log_file + ".1", "rb") as f:
+        assert f.read().count(b"\n") == 1
+
+
+def test_logging_after_close_is_dropped(tmp_path):
+    """Entries logged after close() are dropped and flush() does not block."""
+    logger = InteractionLogger(str(tmp_path / "log.jsonl"))
+    logger.close()
+
+    logger.log_interaction("late", {"response": "ok"})
+    logger.flush()
+    assert logger.dropped == 1
+    assert logger.get_recent_logs(10) == []